@@ -1,30 +1,559 @@
-import base64
+import asyncio
+import atexit
+import hashlib
 import logging
-from fastapi import FastAPI, HTTPException
+import logging.handlers
+import os
+import queue
+import tempfile
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+import orjson
+import pybase64
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ValidationError
 from playwright.async_api import async_playwright
 
 # Logger
+# Records go through a queue to a background thread so the event loop
+# never blocks writing to stderr.
 logger = logging.getLogger("pdf-generator")
 handler = logging.StreamHandler()
 handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
-logger.addHandler(handler)
+log_queue = queue.SimpleQueue()
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
 logger.setLevel(logging.INFO)
+log_listener = logging.handlers.QueueListener(log_queue, handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+# Browser pool
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+PAGES_PER_BROWSER = int(os.getenv("PAGES_PER_BROWSER", "2"))
+PAGE_MAX_USES = int(os.getenv("PAGE_MAX_USES", "50"))
+
+# Renders allowed at once; matches the number of pooled pages by default
+PDF_CONCURRENCY = int(os.getenv("PDF_CONCURRENCY", str(BROWSER_POOL_SIZE * PAGES_PER_BROWSER)))
+CHROMIUM_ARGS = [
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-background-timer-throttling",
+]
+
+# Sub-resources aborted unless the request sets allow_network; CV templates
+# are expected to inline their assets as data: URIs.
+BLOCKED_RESOURCE_TYPES = frozenset({
+    "image", "media", "font", "stylesheet", "xhr", "fetch", "websocket",
+})
+
+# PDF cache
+PDF_CACHE_ENABLED = os.getenv("PDF_CACHE_ENABLED", "1") == "1"
+PDF_CACHE_MAX_ENTRIES = int(os.getenv("PDF_CACHE_MAX_ENTRIES", "128"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Optional second tier on disk, shared across restarts and replicas
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "")
+PDF_DISK_CACHE_MAX_BYTES = int(os.getenv("PDF_DISK_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+PDF_DISK_CACHE_SWEEP_INTERVAL = int(os.getenv("PDF_DISK_CACHE_SWEEP_INTERVAL", "300"))
+
+# CORS: comma-separated list of origins, "*" for any
+ALLOWED_ORIGINS = [origin.strip() for origin in os.getenv("ALLOWED_ORIGINS", "*").split(",") if origin.strip()]
+
+# Maximum number of documents accepted by the batch endpoint
+PDF_BATCH_MAX_SIZE = int(os.getenv("PDF_BATCH_MAX_SIZE", "20"))
+
+# A4 at 96 DPI
+A4_VIEWPORT = {"width": 794, "height": 1123}
+
+# Resolves once every <img> has loaded (or failed) and web fonts are ready,
+# so we don't have to wait for network idle or sleep a fixed amount. Gives up
+# after timeoutMs so an image that never settles (lazy, stalled host) can't
+# hold a pooled page forever; the PDF is then printed with what has loaded.
+ASSET_WAIT_TIMEOUT_MS = int(os.getenv("ASSET_WAIT_TIMEOUT_MS", "10000"))
+WAIT_FOR_ASSETS_JS = """
+async (timeoutMs) => {
+    const ready = (async () => {
+        await Promise.all(Array.from(document.images).map(
+            img => img.complete ? 0 : new Promise(r => {
+                img.addEventListener("load", r, {once: true});
+                img.addEventListener("error", r, {once: true});
+            })
+        ));
+        await document.fonts.ready;
+    })();
+    await Promise.race([ready, new Promise(r => setTimeout(r, timeoutMs))]);
+}
+"""
+
+
+class PooledPage:
+    """A warm A4 page, with its own BrowserContext, on one pooled browser."""
+
+    def __init__(self, browser, context, page):
+        self.browser = browser
+        self.context = context
+        self.page = page
+        self.uses = 0
+        self.allow_network = False
+        # Playwright doesn't close a page whose renderer crashed, so
+        # is_closed() can't tell us; set from the "crash" event or a failed reset
+        self.broken = False
+        page.on("crash", self._on_crash)
+
+    def _on_crash(self, _page):
+        self.broken = True
+
+    async def route(self, route):
+        if not self.allow_network and route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+
+
+class BrowserPool:
+    """
+    Keeps a fixed number of headless Chromium instances warm for the
+    lifetime of the process, each with a few pre-created A4 pages.
+    Requests borrow a page; once it is returned it is reset to about:blank
+    in the background, and recreated after PAGE_MAX_USES renders to keep
+    the JS heap in check.
+    """
+
+    def __init__(self, size: int, pages_per_browser: int, max_uses: int):
+        self.size = size
+        self.pages_per_browser = pages_per_browser
+        self.max_uses = max_uses
+        self._playwright = None
+        self._browsers = []
+        self._pages = asyncio.Queue()
+        self._start_future = None
+        self._relaunches = {}
+        self._owned_contexts = weakref.WeakSet()
+        self._recycling = set()
+
+    async def start(self):
+        # Concurrent callers share a single in-flight launch instead of each
+        # spawning their own set of Chromium processes.
+        if self._start_future is None:
+            self._start_future = asyncio.ensure_future(self._start())
+        try:
+            await asyncio.shield(self._start_future)
+        except Exception:
+            self._start_future = None
+            raise
+
+    async def _start(self):
+        self._playwright = await async_playwright().start()
+        for _ in range(self.size):
+            browser = await self._launch()
+            self._browsers.append(browser)
+            for _ in range(self.pages_per_browser):
+                self._pages.put_nowait(await self._new_page(browser))
+        logger.info(
+            "🚀 Browser pool pronto: %d instância(s) Chromium, %d página(s) cada",
+            self.size, self.pages_per_browser
+        )
+
+    async def _launch(self):
+        return await self._playwright.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+
+    async def _new_page(self, browser):
+        context = await browser.new_context(viewport=A4_VIEWPORT)
+        # Claim it before any further await, or a concurrent leak check on
+        # this browser could close it while the page is still being built.
+        self._owned_contexts.add(context)
+        page = await context.new_page()
+        pooled = PooledPage(browser, context, page)
+        await context.route("**/*", pooled.route)
+        return pooled
+
+    async def _replace(self, browser):
+        # Every page of a crashed browser lands here; they all share one relaunch.
+        future = self._relaunches.get(browser)
+        if future is None:
+            future = asyncio.ensure_future(self._relaunch(browser))
+            self._relaunches[browser] = future
+        return await asyncio.shield(future)
+
+    async def _relaunch(self, browser):
+        logger.warning("⚠️ Browser desconectado, a relançar Chromium")
+        try:
+            fresh = await self._launch()
+        except Exception:
+            del self._relaunches[browser]
+            raise
+        self._browsers[self._browsers.index(browser)] = fresh
+        return fresh
+
+    async def stop(self):
+        for task in self._recycling:
+            task.cancel()
+        await asyncio.gather(*self._recycling, return_exceptions=True)
+        # The driver lives for the whole process; make sure it is stopped even
+        # if a browser fails to close cleanly.
+        try:
+            await asyncio.gather(
+                *(browser.close() for browser in self._browsers),
+                return_exceptions=True
+            )
+        finally:
+            self._browsers.clear()
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+        self._pages = asyncio.Queue()
+        self._relaunches.clear()
+        self._start_future = None
+
+    @asynccontextmanager
+    async def acquire(self, allow_network: bool = False):
+        await self.start()
+        pooled = await self._pages.get()
+        try:
+            if not pooled.browser.is_connected():
+                pooled = await self._new_page(await self._replace(pooled.browser))
+            elif pooled.broken or pooled.page.is_closed():
+                await pooled.context.close()
+                pooled = await self._new_page(pooled.browser)
+            pooled.allow_network = allow_network
+            yield pooled.page
+        finally:
+            # Reset off the response path; the page only rejoins the queue
+            # once _recycle is done with it.
+            task = asyncio.create_task(self._recycle(pooled))
+            self._recycling.add(task)
+            task.add_done_callback(self._recycling.discard)
+
+    async def _recycle(self, pooled):
+        pooled.uses += 1
+        try:
+            if pooled.uses >= self.max_uses:
+                await pooled.context.close()
+                pooled = await self._new_page(pooled.browser)
+            else:
+                await pooled.page.goto("about:blank")
+            if len(pooled.browser.contexts) > self.pages_per_browser:
+                await self._drain_leaked_contexts(pooled.browser)
+        except Exception as e:
+            logger.warning("⚠️ Falha ao reciclar página: %s: %s", type(e).__name__, e)
+            # A page that can't be reset (e.g. crashed renderer) is replaced,
+            # never handed out again as is.
+            try:
+                await pooled.context.close()
+                pooled = await self._new_page(pooled.browser)
+            except Exception as e:
+                # Still queued so the pool keeps its size; acquire() rebuilds
+                # broken pages and relaunches disconnected browsers.
+                logger.warning("⚠️ Falha ao recriar página: %s: %s", type(e).__name__, e)
+                pooled.broken = True
+        finally:
+            self._pages.put_nowait(pooled)
+
+    async def _drain_leaked_contexts(self, browser):
+        # All pages share the browser's CDP connection and each pooled page owns
+        # exactly one context, so anything beyond that is a leak.
+        leaked = [context for context in browser.contexts if context not in self._owned_contexts]
+        if leaked:
+            logger.warning("⚠️ A fechar %d contexto(s) órfão(s)", len(leaked))
+            await asyncio.gather(*(context.close() for context in leaked), return_exceptions=True)
+
+
+class PDFCache:
+    """
+    In-memory LRU of rendered PDFs keyed by a hash of the HTML, bounded
+    both by number of entries and by total bytes held.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    @staticmethod
+    def key(html_content: str) -> bytes:
+        return hashlib.blake2b(html_content.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key: bytes):
+        pdf_bytes = self._entries.get(key)
+        if pdf_bytes is not None:
+            self._entries.move_to_end(key)
+        return pdf_bytes
+
+    def put(self, key: bytes, pdf_bytes: bytes):
+        if len(pdf_bytes) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[key] = pdf_bytes
+        self._bytes += len(pdf_bytes)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+
+class DiskPDFCache:
+    """
+    Content-addressed PDF files under a directory, evicted oldest-first by
+    mtime once a periodic sweep finds the directory past max_bytes.
+    Methods block, so run them on disk_executor.
+    """
+
+    # Temp files older than this belong to no live writer
+    TMP_MAX_AGE = 60 * 60
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: bytes) -> Path:
+        return self.directory / f"{key.hex()}.pdf"
+
+    def get(self, key: bytes):
+        # This tier is optional: any filesystem error is just a miss
+        path = self._path(key)
+        try:
+            pdf_bytes = path.read_bytes()
+        except OSError:
+            return None
+        # Bump mtime so the sweep treats it as recently used; the file may
+        # already be swept by a peer, or the mount may be read-only.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return pdf_bytes
+
+    def put(self, key: bytes, pdf_bytes: bytes):
+        # Unique temp name: concurrent writers of the same key, in this process
+        # or in replicas sharing the volume, must not collide.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(pdf_bytes)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def sweep(self):
+        # Peers on a shared volume sweep too, so any entry may vanish under us.
+        now = time.time()
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+                if entry.name.endswith(".tmp"):
+                    # Left behind by a writer killed mid-write
+                    if now - stat.st_mtime > self.TMP_MAX_AGE:
+                        os.remove(entry.path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if entry.name.endswith(".pdf"):
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+pool = BrowserPool(BROWSER_POOL_SIZE, PAGES_PER_BROWSER, PAGE_MAX_USES)
+pdf_cache = PDFCache(PDF_CACHE_MAX_ENTRIES, PDF_CACHE_MAX_BYTES)
+disk_cache = None
+if PDF_CACHE_DIR:
+    # Optional tier: an unusable volume disables it instead of failing startup
+    try:
+        disk_cache = DiskPDFCache(PDF_CACHE_DIR, PDF_DISK_CACHE_MAX_BYTES)
+    except OSError as e:
+        logger.warning("⚠️ Cache em disco desativada (%s): %s: %s", PDF_CACHE_DIR, type(e).__name__, e)
+# Disk I/O gets its own threads so a slow volume never queues up behind
+# (or in front of) the response encoding on the default executor.
+disk_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf-disk-cache")
+background_tasks = set()
+render_semaphore = asyncio.Semaphore(PDF_CONCURRENCY)
+render_stats = {"in_flight": 0, "waiting": 0}
+
+
+async def render_pdf(html_content: str, allow_network: bool = False) -> bytes:
+    """
+    Renders HTML to an A4 PDF on a pooled page, serving repeated
+    HTML straight from the cache when it is enabled. Remote assets
+    are only fetched when allow_network is set, and those renders are
+    never cached since the remote content can change.
+    """
+    use_cache = PDF_CACHE_ENABLED and not allow_network
+    if use_cache:
+        cache_key = PDFCache.key(html_content)
+        cached = pdf_cache.get(cache_key)
+        if cached is not None:
+            logger.info("♻️ PDF servido a partir da cache")
+            return cached
+        if disk_cache is not None:
+            cached = await asyncio.get_running_loop().run_in_executor(
+                disk_executor, disk_cache.get, cache_key
+            )
+            if cached is not None:
+                logger.info("♻️ PDF servido a partir da cache em disco")
+                pdf_cache.put(cache_key, cached)
+                return cached
+    
+    # Backpressure: excess requests queue here instead of piling onto Chromium
+    render_stats["waiting"] += 1
+    try:
+        await render_semaphore.acquire()
+    finally:
+        render_stats["waiting"] -= 1
+    render_stats["in_flight"] += 1
+    try:
+        async with pool.acquire(allow_network) as page:
+            # Load HTML content; with network allowed, also wait for external
+            # stylesheets and CSS background images
+            await page.set_content(
+                html_content,
+                wait_until="load" if allow_network else "domcontentloaded"
+            )
+            
+            # Wait for images and fonts to load
+            await page.evaluate(WAIT_FOR_ASSETS_JS, ASSET_WAIT_TIMEOUT_MS)
+            
+            # Generate PDF with A4 format, no headers/footers
+            pdf_bytes = await page.pdf(
+                format="A4",
+                print_background=True,
+                margin={"top": "0", "right": "0", "bottom": "0", "left": "0"},
+                display_header_footer=False
+            )
+    finally:
+        render_stats["in_flight"] -= 1
+        render_semaphore.release()
+    
+    if use_cache:
+        pdf_cache.put(cache_key, pdf_bytes)
+        if disk_cache is not None:
+            # Write-behind: the response doesn't wait for the disk
+            task = asyncio.get_running_loop().run_in_executor(
+                disk_executor, disk_cache.put, cache_key, pdf_bytes
+            )
+            background_tasks.add(task)
+            task.add_done_callback(_disk_cache_written)
+    return pdf_bytes
+
+def _disk_cache_written(task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        error = task.exception()
+        logger.warning("⚠️ Falha ao gravar PDF na cache em disco: %s: %s", type(error).__name__, error)
+
+async def sweep_disk_cache():
+    """Evicts from the disk cache every PDF_DISK_CACHE_SWEEP_INTERVAL seconds."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(PDF_DISK_CACHE_SWEEP_INTERVAL)
+        try:
+            await loop.run_in_executor(disk_executor, disk_cache.sweep)
+        except Exception as e:
+            logger.warning("⚠️ Falha ao limpar cache em disco: %s: %s", type(e).__name__, e)
+
+# Constant parts of the JSON envelope around the base64 payload
+PDF_JSON_PREFIX = b'{"success":true,"pdf_base64":"'
+PDF_JSON_SUFFIX = b'","size_bytes":%d}'
+
+# Input slice per base64 call; a multiple of 3 so chunks concatenate cleanly
+BASE64_CHUNK_SIZE = 3 * 16 * 1024
+
+def encode_pdf_json(pdf_bytes: bytes) -> memoryview:
+    """
+    Builds the base64 JSON envelope for a rendered PDF. The base64 alphabet
+    never needs JSON escaping, so the exact body size is known upfront and
+    the encoded chunks are written straight into one preallocated buffer.
+    """
+    suffix = PDF_JSON_SUFFIX % len(pdf_bytes)
+    b64_len = (len(pdf_bytes) + 2) // 3 * 4
+    body = bytearray(len(PDF_JSON_PREFIX) + b64_len + len(suffix))
+    view = memoryview(body)
+    view[:len(PDF_JSON_PREFIX)] = PDF_JSON_PREFIX
+    pos = len(PDF_JSON_PREFIX)
+    source = memoryview(pdf_bytes)
+    for start in range(0, len(source), BASE64_CHUNK_SIZE):
+        encoded = pybase64.b64encode(source[start:start + BASE64_CHUNK_SIZE])
+        view[pos:pos + len(encoded)] = encoded
+        pos += len(encoded)
+    view[pos:] = suffix
+    return view
+
+def encode_pdf_batch_json(results: list) -> bytes:
+    """
+    Builds the JSON body for a batch: the same envelope as encode_pdf_json
+    for each rendered document, or an error entry for a failed one.
+    """
+    items = [
+        orjson.dumps({"success": False, "error": str(result), "type": type(result).__name__})
+        if isinstance(result, Exception) else encode_pdf_json(result)
+        for result in results
+    ]
+    return b"".join((b"[", b",".join(items), b"]"))
 
 # FastAPI app
-app = FastAPI(title="CV PDF Generator")
+app = FastAPI(title="CV PDF Generator", default_response_class=ORJSONResponse)
 
+# Credentials can't be combined with a wildcard origin, so they are only
+# allowed when concrete origins are configured.
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
+    allow_origins=ALLOWED_ORIGINS,
+    allow_credentials="*" not in ALLOWED_ORIGINS,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup():
+    # Encoding runs in the default executor; give it one worker per core
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=os.cpu_count())
+    )
+    await pool.start()
+    if disk_cache is not None:
+        app.state.disk_sweeper = asyncio.create_task(sweep_disk_cache())
+
+@app.on_event("shutdown")
+async def shutdown():
+    if disk_cache is not None:
+        app.state.disk_sweeper.cancel()
+    await pool.stop()
+    disk_executor.shutdown(wait=False)
+
 class GeneratePDFRequest(BaseModel):
     html_content: str
+    allow_network: bool = False
 
 @app.get("/")
 def root():
@@ -38,52 +567,131 @@ def health():
 def healthz():
     return {"status": "ok"}
 
-@app.post("/generate-cv-pdf")
-async def generate_cv_pdf(req: GeneratePDFRequest):
+@app.get("/metrics")
+def metrics():
+    return {
+        "concurrency": PDF_CONCURRENCY,
+        "in_flight": render_stats["in_flight"],
+        "waiting": render_stats["waiting"],
+        "cache_entries": len(pdf_cache),
+        "cache_bytes": pdf_cache.size_bytes,
+    }
+
+def html_charset(content_type):
+    """Returns the charset declared in a text/html Content-Type, defaulting to UTF-8."""
+    for param in content_type.split(";")[1:]:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "charset":
+            return value.strip().strip('"') or "utf-8"
+    return "utf-8"
+
+@app.post(
+    "/generate-cv-pdf",
+    response_model=None,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": GeneratePDFRequest.model_json_schema()},
+                "text/html": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def generate_cv_pdf(
+    request: Request,
+    response_format: str = Query("json", alias="format"),
+    allow_network: bool = Query(False),
+):
     """
     Generates a PDF from HTML content using Playwright.
-    Returns base64-encoded PDF with no headers/footers.
+    Accepts either a JSON GeneratePDFRequest or the HTML itself as a
+    text/html body (with allow_network as a query parameter).
+    Returns the raw PDF when called with ?format=binary or
+    Accept: application/pdf; otherwise returns the base64-encoded PDF
+    in a JSON envelope (deprecated, kept for existing clients).
     """
+    # Read the body ourselves: HTML bodies skip JSON entirely, and JSON is
+    # validated in one pass from bytes instead of json.loads + model build.
+    raw = await request.body()
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("text/html"):
+        charset = html_charset(content_type)
+        try:
+            html_content = raw.decode(charset)
+        except LookupError:
+            raise HTTPException(
+                status_code=415,
+                detail={"error": f"Unsupported charset: {charset}", "type": "UnsupportedCharset"}
+            )
+        except UnicodeDecodeError as e:
+            raise HTTPException(
+                status_code=400,
+                detail={"error": f"Body is not valid {charset}: {e.reason}", "type": "UnicodeDecodeError"}
+            )
+        req = GeneratePDFRequest.model_construct(html_content=html_content, allow_network=allow_network)
+    else:
+        try:
+            req = GeneratePDFRequest.model_validate_json(raw)
+        except ValidationError as e:
+            raise RequestValidationError(
+                [{**error, "loc": ("body", *error["loc"])} for error in e.errors()]
+            )
+    
     logger.info("📄 Recebendo request para gerar PDF do CV")
     
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-            
-            # Set A4 viewport
-            await page.set_viewport_size({"width": 794, "height": 1123})
-            
-            # Load HTML content
-            await page.set_content(req.html_content, wait_until="networkidle")
-            
-            # Wait for fonts to load
-            await page.wait_for_timeout(500)
-            
-            # Generate PDF with A4 format, no headers/footers
-            pdf_bytes = await page.pdf(
-                format="A4",
-                print_background=True,
-                margin={"top": "0", "right": "0", "bottom": "0", "left": "0"},
-                display_header_footer=False
+        pdf_bytes = await render_pdf(req.html_content, req.allow_network)
+        
+        if response_format == "binary" or "application/pdf" in request.headers.get("accept", ""):
+            logger.info("✅ PDF gerado com sucesso: %d bytes", len(pdf_bytes))
+            return Response(
+                content=pdf_bytes,
+                media_type="application/pdf",
+                headers={"Content-Disposition": 'attachment; filename="cv.pdf"'}
             )
-            
-            await browser.close()
-            
-            # Encode to base64
-            pdf_b64 = base64.b64encode(pdf_bytes).decode("utf-8")
-            
-            logger.info(f"✅ PDF gerado com sucesso: {len(pdf_bytes)} bytes")
-            
-            return {
-                "success": True,
-                "pdf_base64": pdf_b64,
-                "size_bytes": len(pdf_bytes)
-            }
-            
+        
+        # Encode to base64 JSON off the event loop
+        body = await asyncio.to_thread(encode_pdf_json, pdf_bytes)
+        
+        logger.info("✅ PDF gerado com sucesso: %d bytes", len(pdf_bytes))
+        
+        return Response(content=body, media_type="application/json")
+        
     except Exception as e:
-        logger.error(f"❌ Erro ao gerar PDF: {type(e).__name__}: {str(e)}")
+        logger.error("❌ Erro ao gerar PDF: %s: %s", type(e).__name__, e)
         raise HTTPException(
             status_code=500,
             detail={"error": str(e), "type": type(e).__name__}
         )
+
+@app.post("/generate-cv-pdf/batch", response_model=None)
+async def generate_cv_pdf_batch(reqs: list[GeneratePDFRequest]):
+    """
+    Generates several PDFs in one call, rendering them in parallel on the
+    shared browser pool. Returns a list of base64 envelopes in request
+    order; a failed document gets an error entry instead of failing the
+    whole batch.
+    """
+    logger.info("📚 Recebendo batch de %d CVs", len(reqs))
+    
+    if len(reqs) > PDF_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": f"Batch too large (max {PDF_BATCH_MAX_SIZE})", "type": "BatchTooLarge"}
+        )
+    
+    results = await asyncio.gather(
+        *(render_pdf(req.html_content, req.allow_network) for req in reqs),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error("❌ Erro ao gerar PDF no batch: %s: %s", type(result).__name__, result)
+    
+    body = await asyncio.to_thread(encode_pdf_batch_json, results)
+    
+    succeeded = sum(not isinstance(result, Exception) for result in results)
+    logger.info("✅ Batch concluído: %d/%d PDFs gerados", succeeded, len(results))
+    
+    return Response(content=body, media_type="application/json")